@@ -5,105 +5,139 @@ Includes greedy and random selection strategies.
 """
 
 import numpy as np
-import pandas as pd
+
+def _greedy_scan(order, costs, budget, horizon):
+    """Walk `order`, keeping each index whose cost still fits in `budget`, until `horizon` picks."""
+    selected = np.empty(max(horizon, 0), dtype=np.int64)
+    n = 0
+    total_cost = 0.0
+    for k in range(order.size):
+        if n >= horizon:
+            break
+        i = order[k]
+        cost = costs[i]
+        if total_cost + cost <= budget:
+            selected[n] = i
+            n += 1
+            total_cost += cost
+    return selected[:n], total_cost
+
+def _weighted_engagement(data):
+    """Per-row likes + 2*comments + 3*saves (NaN as 0), with fixed weights independent of the MDP's."""
+    counts = data[['likes', 'comments', 'saves']].to_numpy(dtype=np.float64)
+    return np.nan_to_num(counts) @ np.array([1.0, 2.0, 3.0])
 
 def evaluate_selection(selected, budget):
-    total_engagement_rate = sum(x['engagement_rate'] for x in selected)
-    total_cost = sum(x['cost'] for x in selected)
-    diversity = len(set(x['username'] for x in selected)) if len(selected) > 0 and 'username' in selected[0] else len(selected)
+    n = len(selected)
+    # Gather cost and rate into (n, 2) in a single traversal, then reduce per column
+    values = np.array([(x['cost'], x['engagement_rate']) for x in selected], dtype=float).reshape(-1, 2)
+    total_cost, total_engagement_rate = values.sum(axis=0).tolist()
+    diversity = len(set(x['username'] for x in selected)) if n > 0 and 'username' in selected[0] else n
     budget_utilization = total_cost / budget if budget else 0
     total_engagement_rate_per_cost = total_engagement_rate / total_cost if total_cost > 0 else 0
     return {
         'total_engagement_rate': total_engagement_rate,
         'total_cost': total_cost,
-        'num_selected': len(selected),
+        'num_selected': n,
         'diversity': diversity,
         'budget_utilization': budget_utilization,
         'total_engagement_rate_per_cost': total_engagement_rate_per_cost
     }
 
-class GreedyBaseline:
+class _Baseline:
+    """Shared setup and evaluation for the batch selection baselines."""
+
     def __init__(self, data, budget=1000, engagement_cols=None, horizon=3):
         self.data = data
         self.budget = budget
         self.engagement_cols = engagement_cols or ['likes', 'comments', 'saves']
         self.horizon = horizon
-        
-    def select_influencers(self):
-        """Select up to `horizon` best influencers based on engagement rate per cost, within budget."""
-        df = self.data.copy()
-        # Ensure engagement rate per cost is calculated + handle division by zero/NaN costs
-        df['engagement_rate_per_cost'] = df.apply(lambda row: row['engagement_rate'] / row['cost'] if row['cost'] > 0 and not pd.isna(row['cost']) else 0, axis=1)
-        sorted_influencers = df.sort_values('engagement_rate_per_cost', ascending=False)
-        selected = []
-        total_cost = 0
-        for _, influencer in sorted_influencers.iterrows():
-            cost = influencer['cost'] if not pd.isna(influencer['cost']) else 0
-            if len(selected) >= self.horizon:
-                break
-            if total_cost + cost <= self.budget:
-                selected.append(influencer)
-                total_cost += cost
-        return selected
-    
+        # Column arrays extracted once; NaN costs count as 0
+        self._costs = np.nan_to_num(data['cost'].to_numpy(dtype=np.float64), nan=0.0)
+        self._engagement = _weighted_engagement(data)
+
     def evaluate(self):
-        selected = self.select_influencers()
-        
-        # Calculate total engagement 
-        total_engagement = sum(
-            (inf.get('likes', 0) if pd.notna(inf.get('likes', 0)) else 0) + 
-            2 * (inf.get('comments', 0) if pd.notna(inf.get('comments', 0)) else 0) + 
-            3 * (inf.get('saves', 0) if pd.notna(inf.get('saves', 0)) else 0)
-            for inf in selected
-        )
+        selected_idx = self.select_influencers()
+        selected = self._rows(selected_idx)
+
+        # Total engagement from the precomputed likes + 2*comments + 3*saves array
+        total_engagement = float(self._engagement[selected_idx].sum())
 
         return {
             'selected_influencers': selected,
-            'total_engagement': total_engagement
+            'selected_indices': selected_idx,
+            'total_engagement': total_engagement,
+            'total_cost': float(self._costs[selected_idx].sum())
         }
-        
+
+    def _rows(self, selected_idx):
+        selected = self.data.iloc[selected_idx].to_dict('records')
+        # Report the NaN-cleaned cost the selection was made with
+        for inf, cost in zip(selected, self._costs[selected_idx].tolist()):
+            inf['cost'] = cost
+        return selected
 
 
-class RandomBaseline:
+class GreedyBaseline(_Baseline):
     def __init__(self, data, budget=1000, engagement_cols=None, horizon=3):
-        self.data = data
-        self.budget = budget
-        self.engagement_cols = engagement_cols or ['likes', 'comments', 'saves']
-        self.horizon = horizon
-        
-    def select_influencers(self):
-        """Select up to `horizon` random influencers within budget."""
-        df = self.data.copy()
-        # Ensure cost is a number before filtering
-        df['cost'] = df['cost'].apply(lambda x: x if not pd.isna(x) else 0)
-        available = df[df['cost'] <= self.budget].copy()
-        if len(available) == 0:
-            return []
-        available = available.sample(frac=1, random_state=None)  # Shuffle
-        selected = []
-        total_cost = 0
-        for _, influencer in available.iterrows():
-            # Ensure cost is a number before adding
-            cost = influencer['cost'] if not pd.isna(influencer['cost']) else 0
-            if len(selected) >= self.horizon:
-                break
-            if total_cost + cost <= self.budget:
-                selected.append(influencer)
-                total_cost += cost
-        return selected
+        super().__init__(data, budget, engagement_cols, horizon)
+        self._rates = data['engagement_rate'].to_numpy(dtype=np.float64)
+
+        # The ranking depends only on the data, so it is computed once here.
+        # Ratio is 0 for non-positive costs
+        self._ratios = self._rates / np.where(self._costs > 0, self._costs, np.inf)
+        # Orders are built lazily in select_influencers; _top_k records the k of _top_order
+        self._top_order = None
+        self._top_k = None
+        self._full_order = None
+
+    def select_influencers(self) -> np.ndarray:
+        """Select up to `horizon` best influencers based on engagement rate per cost, within budget.
+        Returns positional row indices into `data`."""
+        # Only the best few candidates matter: sort an oversampled top-k (re-derived if horizon
+        # changes), the full order is built if budget misfits leave fewer than `horizon` picks
+        k = min(self.horizon * 4, self._ratios.size)
+        if 0 < k < self._ratios.size:
+            if self._top_k != k:
+                kth = -np.partition(-self._ratios, k - 1)[k - 1]
+                # Ties with the k-th ratio come along, so this is a prefix of the full stable order
+                top = np.flatnonzero(self._ratios >= kth)
+                self._top_order = top[np.argsort(-self._ratios[top], kind='stable')]
+                self._top_k = k
+            selected_idx, _ = _greedy_scan(self._top_order, self._costs, self.budget, self.horizon)
+            if selected_idx.size >= self.horizon:
+                return selected_idx
+        if self._full_order is None:
+            self._full_order = np.argsort(-self._ratios, kind='stable')
+        selected_idx, _ = _greedy_scan(self._full_order, self._costs, self.budget, self.horizon)
+        return selected_idx
     
     def evaluate(self):
-        selected = self.select_influencers()
-        
-        # Calculate total engagement using the same logic as MDP's 
-        total_engagement = sum(
-            (inf.get('likes', 0) if pd.notna(inf.get('likes', 0)) else 0) + 
-            2 * (inf.get('comments', 0) if pd.notna(inf.get('comments', 0)) else 0) + 
-            3 * (inf.get('saves', 0) if pd.notna(inf.get('saves', 0)) else 0)
-            for inf in selected
-        )
+        # Greedy selection is deterministic, so the result is computed once and reused
+        if getattr(self, '_cached', None) is None:
+            self._cached = super().evaluate()
+        return self._cached
 
-        return {
-            'selected_influencers': selected,
-            'total_engagement': total_engagement
-        }
+
+class RandomBaseline(_Baseline):
+    def __init__(self, data, budget=1000, engagement_cols=None, horizon=3, seed=None):
+        super().__init__(data, budget, engagement_cols, horizon)
+        self.rng = np.random.default_rng(seed)
+
+    def select_influencers(self) -> np.ndarray:
+        """Select up to `horizon` random influencers within budget.
+        Returns positional row indices into `data`."""
+        available_idx = np.flatnonzero(self._costs <= self.budget)
+        if available_idx.size == 0:
+            return available_idx
+        # Partial shuffle: draw only the first k positions of a random order
+        k = min(self.horizon * 4, available_idx.size)
+        head = self.rng.choice(available_idx, size=k, replace=False, shuffle=True)
+        selected_idx, total_cost = _greedy_scan(head, self._costs, self.budget, self.horizon)
+        if selected_idx.size < self.horizon and k < available_idx.size:
+            # Budget misfits: continue the same random order over the remaining candidates
+            rest = self.rng.permutation(np.setdiff1d(available_idx, head, assume_unique=True))
+            more_idx, _ = _greedy_scan(rest, self._costs, self.budget - total_cost,
+                                       self.horizon - selected_idx.size)
+            selected_idx = np.concatenate([selected_idx, more_idx])
+        return selected_idx
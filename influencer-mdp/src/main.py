@@ -25,46 +25,50 @@ BUDGET = 1000
 UNDERREPRESENTED_GROUPS = ['Black', 'Latinx']
 DIVERSITY_FIRST_SELECTION_BONUS = 500000.0 # Increased for impact
 
+# ---- COLUMNS READ FROM THE DATASET ----
+DATA_COLUMNS = ['username', 'followers', 'likes', 'comments', 'saves', 'race', 'gender']
+
 # Print the engagement formula and weights
 print("\n[INFO] Engagement formula: (likes * {likes}) + (comments * {comments}) + (saves * {saves})".format(**ENGAGEMENT_WEIGHTS))
 print(f"[INFO] Horizon: {HORIZON}, Budget: {BUDGET}")
 print(f"[INFO] Underrepresented Groups for Diversity Bonus: {UNDERREPRESENTED_GROUPS} with bonus {DIVERSITY_FIRST_SELECTION_BONUS}")
 
-def calculate_engagement(influencer):
-    """Consistent engagement calculation across all methods"""
-    return (
-        influencer['likes'] + 
-        2 * influencer['comments'] + 
-        3 * influencer['saves']
-    ) * influencer.get('engagement_rate', 1.0)
-
 def main():
-    train_data, _ = load_train_test_data()
-    
+    train_data, _ = load_train_test_data(usecols=DATA_COLUMNS)
+
+    # Categorical codes make the group/username membership checks below integer comparisons
+    train_data['race'] = train_data['race'].astype('category')
+    train_data['username'] = train_data['username'].astype('category')
+
     # Calculate engagement rate
-    train_data['engagement_rate'] = train_data['engagement'] / train_data['followers'].clip(lower=1)
+    engagement = train_data['engagement'].to_numpy(dtype=np.float64)
+    followers = train_data['followers'].to_numpy(dtype=np.float64)
+    train_data['engagement_rate'] = engagement / np.maximum(followers, 1)
     
     # Limit to first 12 influencers for testing
     train_data = train_data.head(12)
+    engagement, followers = engagement[:12], followers[:12]
 
     # Calculate base cost using a combination of engagement and followers
     # This creates more variation in costs
-    train_data['base_cost'] = (
-        (train_data['engagement'] / 1000) +  # Engagement component
-        (train_data['followers'] / 10000)    # Follower component
-    )
+    base_cost = engagement / 1000      # Engagement component
+    base_cost += followers / 10000     # Follower component
+    train_data['base_cost'] = base_cost
 
-    # Scale the base cost to get a reasonable range
-    train_data['cost'] = train_data['base_cost'] * 50
+    # Scale the base cost to get a reasonable range, in a single output buffer
+    cost = base_cost * 50
 
     # Ensure costs are within reasonable bounds and have more granularity
-    train_data['cost'] = train_data['cost'].clip(lower=100, upper=400)
-    train_data['cost'] = train_data['cost'].round(2)  # Round to 2 decimal places
+    np.clip(cost, 100, 400, out=cost)
+    np.round(cost, 2, out=cost)  # Round to 2 decimal places
 
     # Apply affirmative action: BOOST costs for underrepresented groups
     # This makes them more competitive in the selection process
     underrepresented_groups = ['Black', 'Latinx']
-    train_data.loc[train_data['race'].isin(underrepresented_groups), 'cost'] *= 1.5  # 50% boost
+    race = train_data['race'].cat
+    boosted_codes = race.categories.get_indexer(underrepresented_groups)
+    cost *= np.where(np.isin(race.codes.to_numpy(), boosted_codes[boosted_codes >= 0]), 1.5, 1.0)  # 50% boost
+    train_data['cost'] = cost
 
     print("\n[INFO] Influencer costs after dynamic calculation and affirmative action:")
     print(train_data[['username', 'race', 'cost', 'engagement', 'followers']].sort_values('cost', ascending=False))
@@ -80,13 +84,13 @@ def main():
     print("\n--- Greedy Baseline ---")
     print(f"Total Engagement: {greedy_result['total_engagement']}")
     print("Influencers:", [step['username'] for step in greedy_result['selected_influencers']])
-    print(f"Total Cost: {sum(step['cost'] for step in greedy_result['selected_influencers'])}")
+    print(f"Total Cost: {greedy_result['total_cost']}")
     print(f"Number of Influencers Selected: {len(greedy_result['selected_influencers'])}")
 
     print("\n--- Random Baseline ---")
     print(f"Total Engagement: {random_result['total_engagement']}")
     print("Influencers:", [step['username'] for step in random_result['selected_influencers']])
-    print(f"Total Cost: {sum(step['cost'] for step in random_result['selected_influencers'])}")
+    print(f"Total Cost: {random_result['total_cost']}")
     print(f"Number of Influencers Selected: {len(random_result['selected_influencers'])}")
 
     # Initialize and evaluate MDP model
@@ -105,7 +109,7 @@ def main():
         print(f"  Cost: {step['cost']:.2f}")
         print(f"  Raw Engagement: {step['raw_engagement']:.2f}")
         print(f"  Reward (Applied in MDP): {step['reward_applied']:.2f}")
-        print(f"  Engagement Rate: {train_data[train_data['username'] == step['username']]['engagement_rate'].iloc[0]:.4f}")
+        print(f"  Engagement Rate: {step['engagement_rate']:.4f}")
         print(f"  Remaining Budget Before: {step['remaining_budget']:.2f}\n")
 
     print(f"Total Engagement (sum of applied rewards): {mdp_result['total_engagement']:.2f}")
@@ -121,14 +125,14 @@ def main():
             return f"{val:.2f}"
         return str(val)
     print(f"{'Method':<20}{'Engagement':<15}{'Cost':<10}{'# Selected':<12}")
-    print(f"{'Greedy':<20}{fmt(greedy_result['total_engagement']):<15}{fmt(sum(step['cost'] for step in greedy_result['selected_influencers'])):<10}{len(greedy_result['selected_influencers']):<12}")
-    print(f"{'Random':<20}{fmt(random_result['total_engagement']):<15}{fmt(sum(step['cost'] for step in random_result['selected_influencers'])):<10}{len(random_result['selected_influencers']):<12}")
+    print(f"{'Greedy':<20}{fmt(greedy_result['total_engagement']):<15}{fmt(greedy_result['total_cost']):<10}{len(greedy_result['selected_influencers']):<12}")
+    print(f"{'Random':<20}{fmt(random_result['total_engagement']):<15}{fmt(random_result['total_cost']):<10}{len(random_result['selected_influencers']):<12}")
     print(f"{'MDP':<20}{fmt(mdp_result['total_engagement']):<15}{fmt(mdp_result['total_cost']):<10}{len(mdp_result['selected_influencers']):<12}")
 
     # Warn if NaN detected
     if any(math.isnan(x) for x in [greedy_result['total_engagement'], random_result['total_engagement'], mdp_result['total_engagement']]):
         print("[WARNING] NaN detected in engagement results! Check your data for missing values.")
-    if any(math.isnan(x) for x in [sum(step['cost'] for step in greedy_result['selected_influencers']), sum(step['cost'] for step in random_result['selected_influencers']), mdp_result['total_cost']]):
+    if any(math.isnan(x) for x in [greedy_result['total_cost'], random_result['total_cost'], mdp_result['total_cost']]):
         print("[WARNING] NaN detected in cost results! Check your data for missing values.")
 
     print(f"\n[INFO] Actual steps taken by MDP: {len(mdp_result['selected_influencers'])}")
@@ -1,10 +1,40 @@
+import math
 import numpy as np
 from typing import List, Tuple, Dict
-import pandas as pd
 
-StateType = Tuple[int, int, int]
+StateType = Tuple[float, int, int, int]
+
+def _backward_sweep(action_ptr, step_ptr, actions, rewards, next_index, gamma, V, best_actions):
+    """
+    Bellman backup over states stored in step order, one step at a time from the last.
+    State i's candidates are the slots action_ptr[i]:action_ptr[i + 1] of
+    actions/rewards/next_index, and the states of step t are step_ptr[t]:step_ptr[t + 1].
+    All slots of a step are backed up together; each state keeps its first best action,
+    and states without a finite candidate keep their V.
+    """
+    for step in range(len(step_ptr) - 2, -1, -1):
+        lo, hi = step_ptr[step], step_ptr[step + 1]
+        start, end = action_ptr[lo], action_ptr[hi]
+        if start == end:
+            continue
+        counts = np.diff(action_ptr[lo:hi + 1])
+        owner = np.repeat(np.arange(lo, hi), counts)  # state of each slot
+
+        # Successors are one step later, so their values are already final
+        q = rewards[start:end] + gamma * V[next_index[start:end]]
+        q[np.isnan(q)] = -np.inf
+        seg_starts = action_ptr[lo:hi][counts > 0] - start
+        q_max = np.repeat(np.maximum.reduceat(q, seg_starts), counts[counts > 0])
+
+        hits = np.flatnonzero((q == q_max) & (q > -np.inf))
+        states, first = np.unique(owner[hits], return_index=True)
+        best = hits[first]
+        V[states] = q[best]
+        best_actions[states] = actions[start + best]
 
 class ValueIterationMDP:
+    MAX_BUDGET = 1000
+
     def __init__(self, data, gamma: float = 0.9, epsilon: float = 0.01, horizon: int = 3,
                  engagement_weights: Dict[str, float] = None,
                  underrepresented_groups: List[str] = None,
@@ -12,15 +42,17 @@ class ValueIterationMDP:
                  debug_mode: bool = False):
         """
         ValueIterationMDP for influencer selection.
-        State: (current_budget, current_step, has_selected_underrepresented)
+        State: (current_budget, current_step, has_selected_underrepresented, used)
+        where used is a bitmask of the influencers selected so far.
         Engagement formula: (likes * w1) + (comments * w2) + (saves * w3)
         Weights are configurable via engagement_weights.
         Bonus applied for the first selection of an underrepresented influencer.
+        epsilon is accepted for API compatibility only: the finite horizon is
+        solved exactly in one backward pass, so there is no convergence threshold.
         """
         self.data = data.to_dict('records')
         self.num_influencers = len(self.data)
         self.gamma = gamma
-        self.epsilon = epsilon
         self.horizon = horizon
         self.debug_mode = debug_mode
         self.engagement_weights = engagement_weights or {
@@ -35,78 +67,121 @@ class ValueIterationMDP:
         self.diversity_first_selection_bonus = diversity_first_selection_bonus
         if self.debug_mode: print(f"[MDP] Using underrepresented groups: {self.underrepresented_groups} with first selection bonus {self.diversity_first_selection_bonus}")
 
+        # Per-influencer columns used by the reward and transition, indexed by action
+        self.costs = np.array([inf['cost'] for inf in self.data], dtype=np.float64)
+        self._cost_list = self.costs.tolist()
+        self.base_engagement = np.array([
+            sum(inf.get(metric, 0) * weight for metric, weight in self.engagement_weights.items())
+            for inf in self.data
+        ], dtype=np.float64)
+        # A missing engagement rate leaves the weighted engagement unscaled
+        rates = np.array([inf.get('engagement_rate') for inf in self.data], dtype=np.float64)  # None -> NaN
+        self.engagement_rates = np.where(np.isnan(rates), 1.0, rates)
+        underrepresented = frozenset(self.underrepresented_groups)
+        self.is_underrep = np.fromiter((inf.get('race') in underrepresented for inf in self.data),
+                                       dtype=bool, count=self.num_influencers)
+        # Weighted engagement scaled by engagement rate, which depends only on the influencer
+        self._engagement_cache = self.base_engagement * self.engagement_rates
+        # Reward base score by [has_selected_underrepresented, action]: a first diverse
+        # selection triples the engagement and adds the bonus
+        first_diverse_score = self._engagement_cache * 3.0 + self.diversity_first_selection_bonus
+        self._base_score = np.stack([
+            np.where(self.is_underrep, first_diverse_score, self._engagement_cache),
+            self._engagement_cache,
+        ])
+        # Bytes needed to unpack a used bitmask covering every influencer
+        self._used_nbytes = (self.num_influencers + 7) // 8
+
         self.states = self._initialize_states()
         if self.debug_mode: print(f"[MDP] Initialized {len(self.states)} states.")
-        self.V = {}
+        # V is indexed by a state's position in self.states, see _value_index
+        self._state_index = {state: i for i, state in enumerate(self.states)}
+        self.V = np.zeros(len(self.states))
+        self._terminal_V, self._is_terminal = self._terminal_values()
+        self._non_terminal = np.flatnonzero(~self._is_terminal).tolist()
         self.policy = {}
 
         self.run_value_iteration()
 
     def _initialize_states(self) -> List[StateType]:
-        max_budget = 1000
-        budget_levels = range(0, max_budget + 1, 10)
-        states: List[StateType] = []
+        """
+        States reachable from the initial state, ordered by step.
+        Budgets are exact (initial budget minus the costs in used), so the
+        Bellman backup and evaluate() look up successors without snapping.
+        """
+        init_state: StateType = (self.MAX_BUDGET, 0, 0, 0)
+        reachable = {init_state}
+        frontier = [init_state]
+
+        while frontier:
+            state = frontier.pop()
+            budget, step = state[0], state[1]
+            if step >= self.horizon or budget <= 0:
+                continue
+            for action in self._get_valid_actions(state):
+                next_state = self._get_transition(state, action)
+                if next_state not in reachable:
+                    reachable.add(next_state)
+                    frontier.append(next_state)
+
+        return sorted(reachable, key=lambda s: (s[1], s[0], s[2], s[3]))
+
+    def _terminal_values(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Value of every terminal state (0 elsewhere) and the terminal mask, over self.states.
+        A state is terminal once the horizon is reached or the budget is spent.
+        """
+        budgets = np.array([state[0] for state in self.states], dtype=np.float64)
+        steps = np.array([state[1] for state in self.states])
+        has_selected_underrepresented = np.array([state[2] for state in self.states])
+        is_terminal = (steps >= self.horizon) | (budgets <= 0)
+
+        # Consistent terminal reward calculation
+        terminal_V = np.zeros(len(self.states))
+        # Severe penalty for not selecting enough influencers
+        terminal_V -= np.where(steps < self.horizon, 10000000.0, 0.0)
+        # Larger bonus if diverse creator was selected
+        terminal_V += np.where(has_selected_underrepresented == 1, 5000.0, 0.0)
+        # Penalty for leaving too much budget at the end of horizon
+        terminal_V -= np.where((steps >= self.horizon) & (budgets > 100), budgets * 0.1, 0.0)
+
+        terminal_V[~is_terminal] = 0.0
+        return terminal_V, is_terminal
+
+    def _value_index(self, state: StateType) -> int:
+        """Position of a state in the V array."""
+        return self._state_index[state]
 
-        for step in range(self.horizon + 1):
-            for budget in budget_levels:
-                states.append((budget, step, 0))      # has_selected_underrepresented = 0
-                if step > 0:
-                     states.append((budget, step, 1)) # has_selected_underrepresented = 1
+    def _get_valid_actions(self, state: StateType) -> List[int]:
+        budget, step, has_selected_underrepresented, used = state
 
-        return states
+        # Expand the used bitmask to one flag per influencer
+        used_bytes = np.frombuffer(used.to_bytes(self._used_nbytes, 'little'), dtype=np.uint8)
+        is_used = np.unpackbits(used_bytes, count=self.num_influencers, bitorder='little').astype(bool)
 
-    def _get_valid_actions(self, state: StateType) -> List[int]:
-        budget, step, has_selected_underrepresented = state
-        valid_actions = []
-        
         # Get all valid actions based on budget and not previously selected
-        for i, inf in enumerate(self.data):
-            # Check if we can afford this influencer
-            if inf['cost'] <= budget:
-                # Check if this influencer has already been selected
-                if step == 0 or i not in self.policy.values():
-                    valid_actions.append(i)
+        valid_actions = np.flatnonzero((self.costs <= budget) & ~is_used)
         
         # If we have valid actions + remaining budget is significant
-        if valid_actions and budget > 100:
+        if valid_actions.size and budget > 100:
             # Sort actions by cost to prioritize using more budget
-            valid_actions.sort(key=lambda i: self.data[i]['cost'], reverse=True)
+            valid_actions = valid_actions[np.argsort(-self.costs[valid_actions], kind='stable')]
             
-        return valid_actions
-
-    def _calculate_engagement(self, influencer: Dict) -> float:
-        """
-        Calculate engagement score based on configured weights.
-        Assumes raw engagement has already been scaled.
-        """
-        base_score = sum(
-            influencer.get(metric, 0) * weight 
-            for metric, weight in self.engagement_weights.items()
-        )
-
-        engagement_rate = influencer.get('engagement_rate')
-        if engagement_rate is not None and pd.notna(engagement_rate):
-             base_score *= engagement_rate
-
-        return base_score
+        return valid_actions.tolist()
 
     def _get_reward(self, state: StateType, action: int) -> float:
         """
         Reward function that considers engagement, budget usage, and diversity coverage.
-        State: (current_budget, current_step, has_selected_underrepresented)
+        State: (current_budget, current_step, has_selected_underrepresented, used)
         """
-        budget, step, has_selected_underrepresented = state
-        inf = self.data[action]
-        base_score = self._calculate_engagement(inf)
+        budget, step, has_selected_underrepresented, _ = state
+        # Includes the bonus for first selection of an underrepresented influencer
+        base_score = self._base_score[has_selected_underrepresented, action]
         
-        # Add bonus for first selection of an underrepresented influencer
-        is_underrepresented = inf.get('race') in self.underrepresented_groups
-        if has_selected_underrepresented == 0 and is_underrepresented:
-            base_score *= 3.0  # Triple the base score for first diverse selection
-            base_score += self.diversity_first_selection_bonus
-            if self.debug_mode: print(f"[MDP Reward] Added diversity first selection bonus {self.diversity_first_selection_bonus} and tripled base score for action {action} (race: {inf.get('race')}) at state {state}.")
-
-        remaining_budget = budget - inf.get('cost', 0)
+        if self.debug_mode and has_selected_underrepresented == 0 and self.is_underrep[action]:
+            print(f"[MDP Reward] Added diversity first selection bonus {self.diversity_first_selection_bonus} and tripled base score for action {action} (race: {self.data[action].get('race')}) at state {state}.")
+
+        remaining_budget = budget - self.costs[action]
         
         # Penalize if leaves too much budget
         steps_remaining = self.horizon - step - 1
@@ -132,123 +207,89 @@ class ValueIterationMDP:
         return final_reward
 
     def _get_transition(self, state: StateType, action: int) -> StateType:
-        budget, step, has_selected_underrepresented = state
-        inf = self.data[action]
-        new_budget = budget - inf['cost']
+        # The state's budget is not needed: it is rebuilt from the used bitmask below
+        _, step, has_selected_underrepresented, used = state
+        new_used = used | (1 << action)
+        # Remaining budget from the full set of used costs: fsum is exactly rounded, so every
+        # selection order reaches the same float and maps to the same state
+        spent = []
+        remaining = new_used
+        while remaining:
+            low_bit = remaining & -remaining
+            spent.append(-self._cost_list[low_bit.bit_length() - 1])
+            remaining ^= low_bit
+        new_budget = math.fsum([self.MAX_BUDGET] + spent)
         new_step = step + 1
         
         # Update has_selected_underrepresented flag
-        is_underrepresented = inf.get('race') in self.underrepresented_groups
-        new_has_selected_underrepresented = 1 if is_underrepresented else has_selected_underrepresented
+        new_has_selected_underrepresented = 1 if self.is_underrep[action] else has_selected_underrepresented
 
-        return (new_budget, new_step, new_has_selected_underrepresented)
+        return (new_budget, new_step, new_has_selected_underrepresented, new_used)
 
     def run_value_iteration(self):
-        for state in self.states:
-            self.V[state] = 0.0
-
-        iteration = 0
-        while True:
-            delta = 0
-            new_V = self.V.copy()
-
-            if self.debug_mode: print(f"\n--- Value Iteration Iteration {iteration} ---\n")
-
-            # Ensure budget levels list is accessible
-            budget_levels = sorted(list(set(state[0] for state in self.states)))
-
-            for state in self.states:
-                budget, step, has_selected_underrepresented = state
-
-                # Terminal states
-                if step >= self.horizon or budget <= 0:
-                    # Consistent terminal reward calculation
-                    terminal_reward = 0
-                    
-                    # Severe penalty for not selecting enough influencers
-                    if step < self.horizon:
-                        terminal_reward -= 10000000.0  # Much larger penalty for not selecting enough influencers
-                        if self.debug_mode: print(f"  State {state}: Terminal state with insufficient selections, Value: {terminal_reward:.2f}")
-                    
-                    # Larger bonus if diverse creator was selected
-                    if has_selected_underrepresented == 1:
-                        terminal_reward += 5000.0
-                    
-                    # Penalty for leaving too much budget at the end of horizon
-                    if step >= self.horizon and budget > 100:
-                        terminal_reward -= budget * 0.1
-                    
-                    new_V[state] = terminal_reward
-                    if self.debug_mode: print(f"  State {state}: Terminal state, Value: {new_V[state]:.2f}")
-                    continue
-
-                max_value = float('-inf')
-                best_action = None
-
-                if self.debug_mode: print(f"  Processing state {state}:")
-
-                for action in self._get_valid_actions(state):
-                    reward = self._get_reward(state, action)
-                    next_state_raw = self._get_transition(state, action)
-                    
-                    next_budget_raw = next_state_raw[0]
-                    closest_next_budget = min(budget_levels, key=lambda x: abs(x - next_budget_raw))
-                    next_state_lookup: StateType = (closest_next_budget, next_state_raw[1], next_state_raw[2])
-
-                    value = reward + self.gamma * self.V.get(next_state_lookup, 0)
-
-                    if self.debug_mode: print(f"    Action {action}: Reward {reward:.2f}, Next State (raw) {next_state_raw}, Next State (lookup) {next_state_lookup}, Next State Value {self.V.get(next_state_lookup, 0):.2f}, Total Value {value:.2f}")
-
-                    if value > max_value:
-                        max_value = value
-                        best_action = action
-
-                if best_action is not None: 
-                    if self.debug_mode: print(f"  Best Action for {state}: {best_action}, Max Value: {max_value:.2f}, Previous Value: {self.V[state]:.2f}")
-                    new_V[state] = max_value
-                    self.policy[state] = best_action
-                    delta = max(delta, abs(self.V[state] - max_value))
-                elif self.debug_mode: 
-                    print(f"  No valid action for state {state}. Value remains {self.V[state]:.2f}")
-
-            self.V = new_V
-            iteration += 1
-            if delta < self.epsilon:
-                if self.debug_mode: print(f"Value Iteration converged after {iteration} iterations with delta {delta:.4f}.")
-                break
-            if iteration > 500:
-                if self.debug_mode: print(f"Value Iteration did not converge after 500 iterations. Delta: {delta:.4f}")
-                break
+        """
+        Solve the finite-horizon MDP in one backward pass. Every transition
+        increases step, so sweeping states from the last step to the first
+        finalizes V[next_state] before any state that looks it up.
+        The per-state actions, rewards and successors are flattened into
+        arrays here and _backward_sweep backs up each step in one vectorized pass.
+        """
+        if self.debug_mode: print("\n--- Backward induction ---\n")
+
+        # Valid actions of state i live in actions[action_ptr[i]:action_ptr[i + 1]]
+        action_ptr = np.zeros(len(self.states) + 1, dtype=np.int64)
+        actions, rewards, next_index = [], [], []
+
+        # Terminal values are fixed by the state alone, see _terminal_values
+        self.V[:] = self._terminal_V
+        if self.debug_mode:
+            for i in np.flatnonzero(self._is_terminal):
+                print(f"  State {self.states[i]}: Terminal state, Value: {self.V[i]:.2f}")
+
+        for i in self._non_terminal:
+            state = self.states[i]
+            for action in self._get_valid_actions(state):
+                reward = self._get_reward(state, action)
+                next_state = self._get_transition(state, action)
+                actions.append(action)
+                rewards.append(reward)
+                next_index.append(self._value_index(next_state))
+                if self.debug_mode: print(f"  State {state}, Action {action}: Reward {reward:.2f}, Next State {next_state}")
+            action_ptr[i + 1] = len(actions)
+        # Terminal states contribute empty slot ranges
+        np.maximum.accumulate(action_ptr, out=action_ptr)
+
+        best_actions = np.full(len(self.states), -1, dtype=np.int64)
+        # States of step t are self.states[step_ptr[t]:step_ptr[t + 1]]
+        step_ptr = np.searchsorted([state[1] for state in self.states], np.arange(self.horizon + 2))
+        _backward_sweep(action_ptr, step_ptr, np.array(actions, dtype=np.int64), np.array(rewards, dtype=np.float64),
+                        np.array(next_index, dtype=np.int64), self.gamma, self.V, best_actions)
+
+        for i in np.flatnonzero(best_actions >= 0):
+            self.policy[self.states[i]] = int(best_actions[i])
+            if self.debug_mode: print(f"  Best Action for {self.states[i]}: {best_actions[i]}, Max Value: {self.V[i]:.2f}")
 
     def evaluate(self):
-        # Initial state includes budget, step (0), and has_selected_underrepresented (0)
-        init_state: StateType = (1000, 0, 0)
+        # Initial state includes budget, step (0), has_selected_underrepresented (0) and no used influencers
+        init_state: StateType = (1000, 0, 0, 0)
         state: StateType = init_state
         total_evaluated_reward = 0
         selected = []
         steps = []
         total_cost = 0
 
-        print(f"[MDP Evaluate] Starting evaluation from state: {init_state}")
-        budget_levels = sorted(list(set(state[0] for state in self.states)))
-
+        if self.debug_mode: print(f"[MDP Evaluate] Starting evaluation from state: {init_state}")
         while True:
-            print(f"[MDP Evaluate] Current state: {state}")
-
-            # Find the closest available budget level in the state space for policy lookup
-            actual_budget = state[0]
-            closest_budget = min(budget_levels, key=lambda x: abs(x - actual_budget))
-
-            # Construct the state for policy lookup using the closest budget level + current diversity flag
-            policy_lookup_state: StateType = (closest_budget, state[1], state[2])
+            if self.debug_mode: print(f"[MDP Evaluate] Current state: {state}")
 
-            print(f"[MDP Evaluate] Looking up policy for state: {policy_lookup_state} (Actual budget: {actual_budget:.2f})")
-            action = self.policy.get(policy_lookup_state)
-            print(f"[MDP Evaluate] Policy lookup result (action): {action}")
+            # States carry exact budgets, so the policy is looked up directly
+            if self.debug_mode: print(f"[MDP Evaluate] Looking up policy for state: {state} (Actual budget: {state[0]:.2f})")
+            action = self.policy.get(state)
+            if self.debug_mode: print(f"[MDP Evaluate] Policy lookup result (action): {action}")
 
             # Check terminal conditions
             if action is None or state[1] >= self.horizon or state[0] <= 0:
-                print("[MDP Evaluate] Stopping evaluation: Action is None, Horizon reached, or Budget depleted")
+                if self.debug_mode: print("[MDP Evaluate] Stopping evaluation: Action is None, Horizon reached, or Budget depleted")
                 break
 
             inf = self.data[action]
@@ -258,13 +299,14 @@ class ValueIterationMDP:
             total_evaluated_reward += current_step_reward
             total_cost += inf.get('cost', 0)
 
-            raw_engagement = self._calculate_engagement(inf)
+            raw_engagement = float(self._engagement_cache[action])
 
             steps.append({
                 'step': len(selected),
                 'username': inf.get('username'),
                 'cost': inf.get('cost'),
                 'raw_engagement': raw_engagement,
+                'engagement_rate': inf.get('engagement_rate'),
                 'reward_applied': current_step_reward, 
                 'remaining_budget': state[0],
                 'niche': inf.get('niche'),
@@ -290,7 +332,7 @@ class ValueIterationMDP:
         # Calculate engagement/cost ratio for each influencer
         influencer_ratios = []
         for i, inf in enumerate(self.data):
-            engagement = self._calculate_engagement(inf)
+            engagement = float(self._engagement_cache[i])
             cost = inf.get('cost', 0)
             if cost > 0:
                 ratio = engagement / cost
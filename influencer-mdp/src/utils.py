@@ -2,28 +2,86 @@
 Utility functions for data preprocessing and reward calculations.
 """
 
+import os
 import pandas as pd
 import numpy as np
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Tuple
 
-def load_data(filepath: str = '../data/influencers.csv') -> pd.DataFrame:
+# Raw counts have missing values, so float32 is the narrowest type that holds them
+COUNT_DTYPES = {'followers': 'float32', 'likes': 'float32', 'comments': 'float32', 'saves': 'float32'}
+
+# Cost model constants as float32 scalars, so cost arithmetic never promotes to float64
+COST_DIVISOR = np.float32(35)
+COST_MIN, COST_MAX = np.float32(50), np.float32(350)
+
+def _engagement(df: pd.DataFrame, dtype=np.float64, fill_missing: bool = True,
+                out: np.ndarray = None) -> np.ndarray:
+    """likes + 2*comments + 3*saves over the raw count array; missing counts are 0 when fill_missing."""
+    counts = df[['likes', 'comments', 'saves']].to_numpy(dtype=dtype)
+    if fill_missing:
+        np.nan_to_num(counts, copy=False)  # one in-place pass over all three columns
+    # Row-wise dot product with the weights, a single matvec
+    return np.matmul(counts, np.array([1, 2, 3], dtype=dtype), out=out)
+
+def _preprocess(df: pd.DataFrame) -> np.ndarray:
+    """
+    (n, 3) float32 array of engagement, cost and engagement rate for every
+    row of a raw influencer frame, computed without touching the frame.
+    Column-major, so each column is one contiguous buffer.
+    """
+    features = np.empty((len(df), 3), dtype=np.float32, order='F')
+    engagement, cost, engagement_rate = features[:, 0], features[:, 1], features[:, 2]
+
+    # Engagement = likes + 2*comments + 3*saves
+    _engagement(df, dtype=np.float32, out=engagement)
+
+    # Apply a power transformation to raw engagement to reduce disparity
+    # This helps create a more even playing field among influencers.
+    # engagement_power = 0.5 # Configurable power (e.g., 0.5 for square root)
+    # engagement[:] = np.where(engagement > 0, engagement ** engagement_power, 0)
+
+    # Cost = engagement / 35 clipped to [50, 350], clipped in place
+    np.divide(engagement, COST_DIVISOR, out=cost)
+    np.clip(cost, COST_MIN, COST_MAX, out=cost)
+
+    # Multiply by the reciprocal of the clipped follower count rather than dividing,
+    # all inside the rate column
+    np.maximum(df['followers'].to_numpy(dtype=np.float32), np.float32(1), out=engagement_rate)
+    np.reciprocal(engagement_rate, out=engagement_rate)
+    engagement_rate *= engagement
+
+    return features
+
+def load_data(filepath: str = '../data/influencers.csv', usecols: List[str] = None,
+              chunksize: int = None) -> pd.DataFrame:
     """
     Load and preprocess influencer data from CSV.
     
     Args:
         filepath: Path to the CSV file
+        usecols: Optional subset of columns to parse; rows are then only
+            dropped for missing values in these columns
+        chunksize: Optional number of rows to parse and preprocess at a time,
+            bounding the raw frame held in memory for large files
         
     Returns:
         Preprocessed DataFrame with influencer data
     """
-    df = pd.read_csv(filepath)
-    
+    # Memoized per file version; callers get their own copy to mutate
+    key_cols = None if usecols is None else tuple(usecols)
+    return _load_data(filepath, os.path.getmtime(filepath), key_cols, chunksize).copy()
+
+def _preprocess_influencers(df: pd.DataFrame) -> pd.DataFrame:
+    """load_data's row cleaning and derived columns, for a whole file or one chunk of it."""
     # Basic preprocessing
     df = df.dropna()
     
     # Calculate engagement if not present
     if 'engagement' not in df.columns:
-        df['engagement'] = df['likes'].fillna(0) + 2 * df['comments'].fillna(0) + 3 * df['saves'].fillna(0)
+        # dropna() above already removed missing counts
+        df['engagement'] = _engagement(df, dtype=np.float32, fill_missing=False)
     # Calculate engagement rate if not present
     if 'engagement_rate' not in df.columns:
         df['engagement_rate'] = df['engagement'] / df['followers']
@@ -32,6 +90,20 @@ def load_data(filepath: str = '../data/influencers.csv') -> pd.DataFrame:
     # TO DO: figure out a budget/cost structure that makes sense 
     if 'cost' in df.columns:
         df['cost'] = df['cost'].clip(lower=0)
+
+    return df
+
+@lru_cache(maxsize=8)
+def _load_data(filepath: str, mtime: float, usecols: Tuple[str, ...], chunksize: int) -> pd.DataFrame:
+    # mtime is only part of the cache key, so an edited CSV is parsed again
+    read_kwargs = dict(engine='c', memory_map=True, usecols=usecols, dtype={**COUNT_DTYPES, 'cost': 'float32'})
+    if chunksize is None:
+        df = _preprocess_influencers(pd.read_csv(filepath, **read_kwargs))
+    else:
+        # Only one raw chunk is held at a time; the reader keeps row labels running across chunks
+        chunks = [_preprocess_influencers(chunk) for chunk in pd.read_csv(filepath, chunksize=chunksize, **read_kwargs)]
+        # Chunks emptied by dropna() would demote string columns to object in concat
+        df = pd.concat([chunk for chunk in chunks if len(chunk)] or chunks[:1])
     
     return df
 
@@ -92,27 +164,50 @@ def load_data(filepath: str = '../data/influencers.csv') -> pd.DataFrame:
     
 #     return df 
 
-def load_train_test_data(train_path: str = '../data/train.csv', test_path: str = '../data/test.csv') -> tuple:
-    # Load train + test
-    train_df = pd.read_csv(train_path, encoding='utf-8')
-    test_df = pd.read_csv(test_path, encoding='latin1')
-
-    # Engagement = likes + 2*comments + 3*saves
-    train_df['engagement'] = (
-        train_df['likes'].fillna(0) +
-        2 * train_df['comments'].fillna(0) +
-        3 * train_df['saves'].fillna(0)
-    )
-
-    # Apply a power transformation to raw engagement to reduce disparity
-    # This helps create a more even playing field among influencers.
-    # engagement_power = 0.5 # Configurable power (e.g., 0.5 for square root)
-    # train_df['engagement'] = train_df['engagement'].apply(lambda x: (x**engagement_power) if x > 0 else 0)
-
-    train_df['cost'] = train_df['engagement'] / 35
-    train_df['cost'] = train_df['cost'].clip(lower=50, upper=350)
+def load_train_test_data(train_path: str = '../data/train.csv', test_path: str = '../data/test.csv',
+                         usecols: List[str] = None, return_arrays: bool = False) -> tuple:
+    # With return_arrays, a third element maps 'engagement', 'cost', 'engagement_rate' and
+    # 'followers' to contiguous float32 arrays of the train rows, for loops that index each
+    # one by row; 'features' is the column-major (n, 3) engagement/cost/rate block the first
+    # three are column views of, so a column stays one contiguous run (its rows are strided)
+    # Memoized per file version; callers get their own copies to mutate
+    key_cols = None if usecols is None else tuple(usecols)
+    train_df, test_df, arrays = _load_train_test_data(train_path, os.path.getmtime(train_path),
+                                                      test_path, os.path.getmtime(test_path), key_cols)
+    if return_arrays:
+        # Copy the block once, keeping its layout, and hand out views of the copy's columns
+        features = arrays['features'].copy(order='F')
+        return train_df.copy(), test_df.copy(), {
+            'features': features,
+            'engagement': features[:, 0],
+            'cost': features[:, 1],
+            'engagement_rate': features[:, 2],
+            'followers': arrays['followers'].copy(),
+        }
+    return train_df.copy(), test_df.copy()
 
-    train_df['engagement_rate'] = train_df['engagement'] / train_df['followers'].clip(lower=1)
+@lru_cache(maxsize=8)
+def _load_train_test_data(train_path: str, train_mtime: float, test_path: str, test_mtime: float,
+                          usecols: Tuple[str, ...]) -> tuple:
+    # The mtimes are only part of the cache key, so edited CSVs are parsed again
+    # Load train + test, optionally restricted to the columns the caller needs
+    # The C parser releases the GIL, so the two files are parsed concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # The C parser tokenizes straight from a memory map of each file
+        train_future = executor.submit(pd.read_csv, train_path, encoding='utf-8', usecols=usecols,
+                                       dtype=COUNT_DTYPES, engine='c', memory_map=True)
+        test_future = executor.submit(pd.read_csv, test_path, encoding='latin1', usecols=usecols,
+                                      dtype=COUNT_DTYPES, engine='c', memory_map=True)
+        train_df, test_df = train_future.result(), test_future.result()
 
-    return train_df, test_df
+    features = _preprocess(train_df)
+    train_df['engagement'], train_df['cost'], train_df['engagement_rate'] = features.T
 
+    arrays = {
+        'features': features,
+        'engagement': features[:, 0],
+        'cost': features[:, 1],
+        'engagement_rate': features[:, 2],
+        'followers': np.ascontiguousarray(train_df['followers'].to_numpy(dtype=np.float32)),
+    }
+    return train_df, test_df, arrays